@@ -0,0 +1,49 @@
+"""
+On-disk daily bar cache — one Parquet file per symbol.
+Past bars never change, so a refresh only has to download the tail
+after the last cached date.
+"""
+
+import logging
+import os
+import tempfile
+from pathlib import Path
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = Path(os.getenv("BARS_CACHE_DIR", "cache"))
+
+
+def _path(sym: str) -> Path:
+    return CACHE_DIR / f"{sym}.parquet"
+
+
+def load_bars(sym: str) -> pd.DataFrame | None:
+    path = _path(sym)
+    if not path.exists():
+        return None
+    try:
+        return pd.read_parquet(path)
+    except Exception as e:
+        logger.warning(f"Bar cache read failed for {sym}: {e}")
+        return None
+
+
+def save_bars(sym: str, df: pd.DataFrame) -> None:
+    path = _path(sym)
+    tmp = None
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Unique temp name per write: /api/test and the refresh pool may save
+        # the same symbol at once, and must not share one half-written file
+        with tempfile.NamedTemporaryFile(dir=path.parent, prefix=f"{path.stem}.", suffix=".tmp",
+                                         delete=False) as f:
+            tmp = Path(f.name)
+            df.to_parquet(f, index=False)
+        tmp.replace(path)  # atomic swap, readers never see a partial file
+    except Exception as e:
+        logger.warning(f"Bar cache write failed for {sym}: {e}")
+        if tmp is not None:
+            tmp.unlink(missing_ok=True)
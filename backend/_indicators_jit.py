@@ -0,0 +1,130 @@
+"""
+Fused indicator kernel for one symbol's bar window, plus a batched driver
+over the whole universe stored as (N_symbols, N_bars) float32 blocks.
+Compiled with numba when it is installed.
+"""
+
+import numpy as np
+
+try:
+    from numba import config, njit, prange
+    # prange runs in a worker thread off the event loop (build_cache); TBB's
+    # pool launched from a non-main thread can block interpreter shutdown,
+    # so prefer OpenMP
+    config.THREADING_LAYER_PRIORITY = ["omp", "workqueue", "tbb"]
+except ImportError:  # numba missing → run the same code as plain Python
+    def njit(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]):
+            return args[0]
+        return lambda f: f
+    prange = range
+
+
+# Explicit float32 signatures: both kernels compile eagerly at import (or load
+# from numba's on-disk cache) and only ever see contiguous float32 bars
+_COMPUTE_ALL_SIG = "UniTuple(f8, 10)(f4[::1], f4[::1], f4[::1])"
+_BATCHED_SIG     = "f8[:, ::1](f4[:, ::1], f4[:, ::1], f4[:, ::1], i8[::1])"
+
+
+@njit(_COMPUTE_ALL_SIG, cache=True, fastmath=True)
+def compute_all(close, high, low):
+    """
+    Returns (rsi, macd, macd_signal, macd_hist, ema9, ema21, sma20,
+             bb_upper, bb_lower, atr) for the last bar.
+    RSI is Wilder-smoothed (14), ATR is the mean of the last 14 true ranges,
+    EMAs use the adjust=False recurrence seeded from the first close, bands
+    are SMA20 ± 2 population std.
+    Inputs are float32 bars; all accumulation happens in float64.
+    """
+    n = close.shape[0]
+    price = float(close[n - 1])
+
+    # EMA 9/12/21/26 + MACD signal(9), one recurrence each
+    a9, a12, a21, a26 = 2.0 / 10.0, 2.0 / 13.0, 2.0 / 22.0, 2.0 / 27.0
+    e9 = e12 = e21 = e26 = float(close[0])
+    sig = 0.0
+
+    # Wilder RSI(14); ATR(14) = plain mean of the final 14 true ranges
+    gain = loss = tr_sum = 0.0
+
+    # Welford mean/variance over the last 20 closes, fed by the same loop
+    w0 = n - 20
+    wk, wmean, wm2 = (1, float(close[0]), 0.0) if w0 <= 0 else (0, 0.0, 0.0)
+
+    for i in range(1, n):
+        c = float(close[i])
+        prev = float(close[i - 1])
+        hi = float(high[i])
+        lo = float(low[i])
+        e9  = a9  * c + (1.0 - a9)  * e9
+        e12 = a12 * c + (1.0 - a12) * e12
+        e21 = a21 * c + (1.0 - a21) * e21
+        e26 = a26 * c + (1.0 - a26) * e26
+        sig = a9 * (e12 - e26) + (1.0 - a9) * sig
+
+        if i >= w0:
+            wk += 1
+            delta = c - wmean
+            wmean += delta / wk
+            wm2 += delta * (c - wmean)
+
+        d = c - prev
+        g = d if d > 0 else 0.0
+        l = -d if d < 0 else 0.0
+        if i <= 14:
+            gain += g / 14.0
+            loss += l / 14.0
+        else:
+            gain = (gain * 13.0 + g) / 14.0
+            loss = (loss * 13.0 + l) / 14.0
+        if i >= n - 14:
+            tr_sum += max(hi - lo, abs(hi - prev), abs(lo - prev))
+
+    if n < 15:
+        rsi, atr = 50.0, 0.0
+    else:
+        rsi = 100.0 if loss == 0 else 100.0 - 100.0 / (1.0 + gain / loss)
+        atr = tr_sum / 14.0
+
+    if n < 26:
+        macd = sig = hist = 0.0
+    else:
+        macd = e12 - e26
+        hist = macd - sig
+
+    # Bollinger(20, 2) from the Welford window, population std
+    if n < 20:
+        sma20 = bb_upper = bb_lower = price
+    else:
+        sma20 = wmean
+        std = np.sqrt(wm2 / 20.0)
+        bb_upper = sma20 + 2.0 * std
+        bb_lower = sma20 - 2.0 * std
+
+    return rsi, macd, sig, hist, e9, e21, sma20, bb_upper, bb_lower, atr
+
+
+@njit(_BATCHED_SIG, cache=True, parallel=True)
+def batched_indicators(close, high, low, lengths):
+    """
+    compute_all for every row of right-aligned (N, B) bar blocks; row i holds
+    lengths[i] valid bars at its end. Returns an (N, 10) float64 matrix with
+    columns in compute_all's return order.
+    """
+    n_sym, width = close.shape
+    out = np.empty((n_sym, 10))
+    for i in prange(n_sym):
+        s = width - lengths[i]
+        (rsi, macd, sig, hist, e9, e21, sma20,
+         bb_upper, bb_lower, atr) = compute_all(close[i, s:], high[i, s:], low[i, s:])
+        out[i, 0] = rsi
+        out[i, 1] = macd
+        out[i, 2] = sig
+        out[i, 3] = hist
+        out[i, 4] = e9
+        out[i, 5] = e21
+        out[i, 6] = sma20
+        out[i, 7] = bb_upper
+        out[i, 8] = bb_lower
+        out[i, 9] = atr
+    return out
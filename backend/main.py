@@ -1,23 +1,35 @@
 """
 N50 Swing Algo — Backend API v5
-Data: nsepython library (official NSE data, works from cloud servers)
+Data: pluggable provider (providers.py), official NSE data via nsepython by default
 """
 
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import asynccontextmanager
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
+import asyncio
+import gzip
+import hashlib
+import numpy as np
+import orjson
 import pandas as pd
 import threading
 import logging
+import os
 import time
 from datetime import datetime, timedelta
+from types import MappingProxyType
+
+from _bars_cache import load_bars, save_bars
+from _indicators_jit import batched_indicators
+from providers import get_provider
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # ─── NIFTY 50 ─────────────────────────────────────────────────────────────────
-NIFTY50_SYMBOLS = [
+NIFTY50_SYMBOLS = (
     "RELIANCE", "TCS", "HDFCBANK", "INFY", "ICICIBANK",
     "HINDUNILVR", "SBIN", "BHARTIARTL", "ITC", "KOTAKBANK",
     "LT", "AXISBANK", "ASIANPAINT", "MARUTI", "WIPRO",
@@ -28,9 +40,9 @@ NIFTY50_SYMBOLS = [
     "DRREDDY", "CIPLA", "DIVISLAB", "BAJAJFINSV", "TATACONSUM",
     "APOLLOHOSP", "BRITANNIA", "HEROMOTOCO", "HINDALCO", "SBILIFE",
     "HDFCLIFE", "UPL", "SHRIRAMFIN", "BEL", "TRENT",
-]
+)
 
-SECTOR_MAP = {
+SECTOR_MAP = MappingProxyType({
     "RELIANCE": "Energy",    "TCS": "IT",             "HDFCBANK": "Banking",
     "INFY": "IT",            "ICICIBANK": "Banking",  "HINDUNILVR": "FMCG",
     "SBIN": "Banking",       "BHARTIARTL": "Telecom", "ITC": "FMCG",
@@ -48,122 +60,95 @@ SECTOR_MAP = {
     "HEROMOTOCO": "Auto",    "HINDALCO": "Metal",     "SBILIFE": "Insurance",
     "HDFCLIFE": "Insurance", "UPL": "Agro",           "SHRIRAMFIN": "NBFC",
     "BEL": "Defence",        "TRENT": "Retail",
-}
+})
 
 # ─── CACHE ────────────────────────────────────────────────────────────────────
 _cache: dict = {}
+_cache_bytes: bytes = b""  # _cache pre-encoded once per refresh, served as-is
+_cache_gz: bytes = b""     # gzip of _cache_bytes for clients that accept it
+_cache_etag: str = ""      # md5 of _cache_bytes, for conditional GETs
 _cache_ts: float = 0
-_fetching: bool = False
+_cache_lock = threading.Lock()
+_signal_memo: dict = {}  # "{sym}:{last bar date}" → (bars/expiry fingerprint, signal) from the last refresh
+# Loop-bound, so the lifespan replaces both with fresh ones on every app start
+_fetch_lock = asyncio.Lock()    # held while do_fetch runs; one refresh at a time
+_refresh_now = asyncio.Event()  # set by /api/refresh to wake the refresher early
 CACHE_TTL = 3600  # 1 hour
+FETCH_WORKERS = int(os.getenv("FETCH_WORKERS", "8"))  # concurrent data requests per refresh
+_fetch_pool: ThreadPoolExecutor | None = None  # runs the blocking provider calls; one per app lifespan
+_fetch_slots = threading.BoundedSemaphore(FETCH_WORKERS)  # caps in-flight provider calls process-wide
+N_BARS = 60        # daily bars kept per symbol
 
-# ─── DATA FETCHER (nsepython) ─────────────────────────────────────────────────
-def fetch_stock(symbol: str) -> pd.DataFrame:
-    from nsepython import equity_history
-    end   = datetime.now().strftime("%d-%m-%Y")
-    start = (datetime.now() - timedelta(days=90)).strftime("%d-%m-%Y")
-
-    # equity_history returns a DataFrame directly
-    df = equity_history(symbol, "EQ", start, end)
+# ─── DATA FETCHER ─────────────────────────────────────────────────────────────
+PROVIDER = get_provider(os.getenv("DATA_PROVIDER", "nse"))
 
-    if df is None or df.empty:
-        raise ValueError(f"Empty data for {symbol}")
-
-    # Normalise column names to lowercase
-    df.columns = [c.strip().lower() for c in df.columns]
-
-    # Map NSE column names → standard names
-    col_map = {
-        "ch_timestamp":        "date",
-        "ch_opening_price":    "open",
-        "ch_trade_high_price": "high",
-        "ch_trade_low_price":  "low",
-        "ch_closing_price":    "close",
-    }
-    df = df.rename(columns=col_map)
+def _download(symbol: str, since: datetime, until: datetime) -> pd.DataFrame | None:
+    with _fetch_slots:
+        df = PROVIDER.fetch_raw(symbol, since, until)
+    return PROVIDER.normalise(df) if df is not None and not df.empty else None
 
-    # Keep only what we need
-    needed = [c for c in ["date", "open", "high", "low", "close"] if c in df.columns]
-    df = df[needed]
 
-    df["date"]  = pd.to_datetime(df["date"], errors="coerce")
-    for col in ["open", "high", "low", "close"]:
-        if col in df.columns:
-            df[col] = pd.to_numeric(df[col], errors="coerce")
+def fetch_stock(symbol: str) -> pd.DataFrame:
+    now    = datetime.now()
+    window = now - timedelta(days=90)
+
+    # Only download bars from the second-to-last cached date on: the last bar
+    # is re-fetched in case it was still forming, the one before it is final
+    # and anchors the splice. Fall back to the full window when cold/stale
+    cache_key = f"{PROVIDER.key}/{symbol}"
+    cached = load_bars(cache_key)
+    if cached is not None:
+        cached = cached.dropna(subset=["date", "high", "low", "close"])  # files written before incomplete rows were dropped
+        if len(cached) < 2 or cached["date"].iloc[-1] < window:
+            cached = None
+    since = cached["date"].iloc[-2] if cached is not None else window
+    fresh = _download(symbol, since, now)
+
+    # A final bar whose close moved means the provider re-based its history
+    # (split/bonus adjustment) — the cached bars no longer line up, refetch all
+    if cached is not None and fresh is not None:
+        anchor = fresh.loc[fresh["date"] == since, "close"]
+        if len(anchor) and not np.isclose(anchor.iloc[0], cached["close"].iloc[-2], rtol=1e-4):
+            logger.info(f"{symbol}: history adjusted since last cache, refetching full window")
+            cached, fresh = None, _download(symbol, window, now)
+
+    if fresh is None and cached is None:
+        raise ValueError(f"Empty data for {symbol}")
 
-    df = df.dropna(subset=["close"]).sort_values("date").tail(60).reset_index(drop=True)
+    df = pd.concat([f for f in (cached, fresh) if f is not None], ignore_index=True)
+    df = (df.drop_duplicates(subset="date", keep="last")
+            .sort_values("date").tail(N_BARS).reset_index(drop=True))
+    if fresh is not None:
+        save_bars(cache_key, df)
     return df
 
 
 def fetch_nifty() -> dict:
     try:
-        from nsepython import nsefetch
-        data = nsefetch("https://www.nseindia.com/api/allIndices")
-        for idx in data.get("data", []):
-            if idx.get("index") == "NIFTY 50":
-                return {
-                    "price":     round(float(idx["last"]), 2),
-                    "change":    round(float(idx["change"]), 2),
-                    "changePct": round(float(idx["percentChange"]), 2),
-                }
-        logger.warning("NIFTY 50 not found in allIndices response")
+        with _fetch_slots:
+            quote = PROVIDER.fetch_index()
+        if quote is not None:
+            return quote
+        logger.warning("NIFTY 50 not found in index response")
     except Exception as e:
         logger.error(f"Nifty index error: {e}")
     return {"price": 22450.0, "change": 0.0, "changePct": 0.0}
 
-# ─── INDICATORS ───────────────────────────────────────────────────────────────
-def calc_rsi(s: pd.Series, p: int = 14) -> float:
-    if len(s) < p + 1:
-        return 50.0
-    d = s.diff().dropna()
-    g = d.clip(lower=0).rolling(p).mean().iloc[-1]
-    l = (-d.clip(upper=0)).rolling(p).mean().iloc[-1]
-    if l == 0:
-        return 100.0
-    return round(100 - 100 / (1 + g / l), 2)
-
-def calc_macd(s: pd.Series) -> dict:
-    if len(s) < 26:
-        return {"macd": 0, "signal": 0, "hist": 0}
-    m   = s.ewm(span=12, adjust=False).mean() - s.ewm(span=26, adjust=False).mean()
-    sig = m.ewm(span=9, adjust=False).mean()
-    return {
-        "macd":   round(float(m.iloc[-1]), 2),
-        "signal": round(float(sig.iloc[-1]), 2),
-        "hist":   round(float((m - sig).iloc[-1]), 2),
-    }
-
-def calc_bb(s: pd.Series, p: int = 20) -> dict:
-    if len(s) < p:
-        v = float(s.iloc[-1])
-        return {"upper": v, "lower": v, "mid": v, "width": 0}
-    sma = s.rolling(p).mean().iloc[-1]
-    std = s.rolling(p).std().iloc[-1]
-    return {
-        "upper": round(float(sma + 2 * std), 2),
-        "lower": round(float(sma - 2 * std), 2),
-        "mid":   round(float(sma), 2),
-        "width": round(float(std * 4 / sma * 100), 2) if sma else 0,
-    }
-
-def calc_atr(hi: pd.Series, lo: pd.Series, cl: pd.Series, p: int = 14) -> float:
-    if len(cl) < p + 1:
-        return 0
-    # Reset indices to avoid alignment issues on concat
-    hi = hi.reset_index(drop=True)
-    lo = lo.reset_index(drop=True)
-    cl = cl.reset_index(drop=True)
-    tr = pd.concat([
-        hi - lo,
-        (hi - cl.shift()).abs(),
-        (lo - cl.shift()).abs(),
-    ], axis=1).max(axis=1)
-    return round(float(tr.rolling(p).mean().iloc[-1]), 2)
-
-def to_strike(price: float) -> int:
-    if price > 5000: return round(price / 100) * 100
-    if price > 1000: return round(price / 50)  * 50
-    if price > 500:  return round(price / 20)  * 20
-    return round(price / 10) * 10
+# ─── HELPERS ──────────────────────────────────────────────────────────────────
+# Strike grid: ≤500 → 10, ≤1000 → 20, ≤5000 → 50, above → 100
+_STRIKE_BREAKS = np.array([500.0, 1000.0, 5000.0])
+_STRIKE_STEPS  = np.array([10, 20, 50, 100])
+# Option legs as multiples of spot: ATM, ±3%, +2.5%, +4%, -2.5%, -4%
+_STRIKE_MULTS  = np.array([1.0, 1.03, 0.97, 1.025, 1.04, 0.975, 0.96])
+# Target / stop-loss levels as multiples of spot: long tgt, long SL, short tgt, short SL
+_LEVEL_MULTS   = np.array([1.04, 0.985, 0.96, 1.015])
+# Rupee figures as multiples of ATR: max profit, max loss, spread / ATM / condor premium
+_ATR_MULTS     = np.array([3.0, 1.5, 1.2, 0.8, 0.6])
+
+def to_strike(price):
+    """Round a price (or array of prices) to the nearest listed strike."""
+    step = _STRIKE_STEPS[np.searchsorted(_STRIKE_BREAKS, price)]
+    return (np.round(price / step) * step).astype(np.int64)
 
 def next_expiry() -> str:
     t = datetime.now()
@@ -171,136 +156,252 @@ def next_expiry() -> str:
     return (t + timedelta(days=d)).strftime("%d %b '%y")
 
 # ─── SIGNAL ENGINE ────────────────────────────────────────────────────────────
-def generate_signal(sym: str, df: pd.DataFrame) -> dict:
-    prices = df["close"].tolist()
-    highs  = df["high"].tolist()
-    lows   = df["low"].tolist()
-    if len(prices) < 10:
-        return None
-
-    s     = pd.Series(prices)
-    price = prices[-1]
-    rsi   = calc_rsi(s)
-    macd  = calc_macd(s)
-    bb    = calc_bb(s)
-    atr   = calc_atr(pd.Series(highs), pd.Series(lows), s)
-    ema9  = round(float(s.ewm(span=9,  adjust=False).mean().iloc[-1]), 2)
-    ema21 = round(float(s.ewm(span=21, adjust=False).mean().iloc[-1]), 2)
-    sma20 = round(float(s.rolling(20).mean().iloc[-1]), 2) if len(prices) >= 20 else price
-    chg   = round((price - prices[-2]) / prices[-2] * 100, 2) if len(prices) > 1 else 0
-    chg5  = round((price - prices[-6]) / prices[-6] * 100, 2) if len(prices) > 5 else 0
-
-    sc, rs = 0, []
-    if rsi < 35:   sc += 2;   rs.append("RSI oversold")
-    elif rsi > 65: sc -= 2;   rs.append("RSI overbought")
-    elif rsi < 50: sc += 0.5
-    else:          sc -= 0.5
-
-    if macd["hist"] > 0: sc += 1.5; rs.append("MACD bullish crossover")
-    else:                sc -= 1.5; rs.append("MACD bearish crossover")
-
-    if ema9 > ema21: sc += 1; rs.append("9EMA above 21EMA")
-    else:            sc -= 1; rs.append("9EMA below 21EMA")
-
-    rng   = bb["upper"] - bb["lower"]
-    bbpos = (price - bb["lower"]) / rng if rng > 0 else 0.5
-    if bbpos < 0.2:   sc += 1.5; rs.append("Price near BB lower band")
-    elif bbpos > 0.8: sc -= 1.5; rs.append("Price near BB upper band")
-
-    if price > sma20 * 1.02:   sc += 0.5
-    elif price < sma20 * 0.98: sc -= 0.5
-
-    direction  = "LONG" if sc >= 1 else "SHORT" if sc <= -1 else "NEUTRAL"
-    confidence = min(99, round(abs(sc) / 6 * 100))
-    k  = to_strike(price)
-    ex = next_expiry()
+# Reason labels, in the order the rows of score_signals' mask stack are built
+REASONS = (
+    "RSI oversold", "RSI overbought",
+    "MACD bullish crossover", "MACD bearish crossover",
+    "9EMA above 21EMA", "9EMA below 21EMA",
+    "Price near BB lower band", "Price near BB upper band",
+)
+
+# Every score term is a multiple of 0.5, so score*2 is an integer half-step
+# count; direction and confidence are precomputed per half-step (±12 points)
+_HALF_STEPS = np.arange(-24, 25)
+_DIR_LUT    = np.where(_HALF_STEPS >= 2, "LONG", np.where(_HALF_STEPS <= -2, "SHORT", "NEUTRAL"))
+_CONF_LUT   = np.minimum(99, np.round(np.abs(_HALF_STEPS) / 2 / 6 * 100)).astype(np.int8)
+
+def score_signals(price, rsi, hist, ema9, ema21, bbpos, sma20):
+    """Score the whole universe at once; every argument is an (N,) array."""
+    score = (
+        np.where(rsi < 35, 2.0, np.where(rsi > 65, -2.0, np.where(rsi < 50, 0.5, -0.5)))
+        + np.where(hist > 0, 1.5, -1.5)
+        + np.where(ema9 > ema21, 1.0, -1.0)
+        + np.select([bbpos < 0.2, bbpos > 0.8], [1.5, -1.5], 0.0)
+        + np.select([price > sma20 * 1.02, price < sma20 * 0.98], [0.5, -0.5], 0.0)
+    )
+    idx        = np.clip(np.rint(score * 2).astype(np.int64) + 24, 0, 48)
+    direction  = _DIR_LUT[idx]
+    confidence = _CONF_LUT[idx]
+    reasons    = np.stack([
+        rsi < 35,    ~(rsi < 35) & (rsi > 65),
+        hist > 0,    ~(hist > 0),
+        ema9 > ema21, ~(ema9 > ema21),
+        bbpos < 0.2, ~(bbpos < 0.2) & (bbpos > 0.8),
+    ])
+    return score, direction, confidence, reasons
+
+def option_play(sym: str, direction: str, confidence: int,
+                strikes: list, levels: list, premiums: list, ex: str) -> tuple:
+    """strikes/levels/premiums: one row of the _STRIKE/_LEVEL/_ATR_MULTS products."""
+    k, k_up3, k_dn3, k_up25, k_up4, k_dn25, k_dn4 = strikes
+    long_tgt, long_sl, short_tgt, short_sl = levels
+    max_profit, max_loss, spread_prem, atm_prem, condor_prem = premiums
 
     if direction == "LONG":
         if confidence > 70:
             opt = "Bull Call Spread"
-            det = {"buy": f"{sym} {k} CE", "sell": f"{sym} {to_strike(price*1.03)} CE",
-                   "expiry": ex, "maxProfit": f"₹{round(atr*3)}", "maxLoss": f"₹{round(atr*1.5)}", "premium": f"₹{round(atr*1.2)}"}
+            det = {"buy": f"{sym} {k} CE", "sell": f"{sym} {k_up3} CE",
+                   "expiry": ex, "maxProfit": f"₹{max_profit}", "maxLoss": f"₹{max_loss}", "premium": f"₹{spread_prem}"}
         else:
             opt = "ATM Call Buy"
             det = {"buy": f"{sym} {k} CE", "expiry": ex,
-                   "target": f"₹{round(price*1.04,2)}", "stopLoss": f"₹{round(price*0.985,2)}", "premium": f"₹{round(atr*0.8)}"}
+                   "target": f"₹{long_tgt}", "stopLoss": f"₹{long_sl}", "premium": f"₹{atm_prem}"}
     elif direction == "SHORT":
         if confidence > 70:
             opt = "Bear Put Spread"
-            det = {"buy": f"{sym} {k} PE", "sell": f"{sym} {to_strike(price*0.97)} PE",
-                   "expiry": ex, "maxProfit": f"₹{round(atr*3)}", "maxLoss": f"₹{round(atr*1.5)}", "premium": f"₹{round(atr*1.2)}"}
+            det = {"buy": f"{sym} {k} PE", "sell": f"{sym} {k_dn3} PE",
+                   "expiry": ex, "maxProfit": f"₹{max_profit}", "maxLoss": f"₹{max_loss}", "premium": f"₹{spread_prem}"}
         else:
             opt = "ATM Put Buy"
             det = {"buy": f"{sym} {k} PE", "expiry": ex,
-                   "target": f"₹{round(price*0.96,2)}", "stopLoss": f"₹{round(price*1.015,2)}", "premium": f"₹{round(atr*0.8)}"}
+                   "target": f"₹{short_tgt}", "stopLoss": f"₹{short_sl}", "premium": f"₹{atm_prem}"}
     else:
         opt = "Iron Condor"
-        det = {"sellCall": f"{sym} {to_strike(price*1.025)} CE", "buyCall": f"{sym} {to_strike(price*1.04)} CE",
-               "sellPut":  f"{sym} {to_strike(price*0.975)} PE", "buyPut":  f"{sym} {to_strike(price*0.96)} PE",
-               "expiry": ex, "premium": f"₹{round(atr*0.6)}"}
+        det = {"sellCall": f"{sym} {k_up25} CE", "buyCall": f"{sym} {k_up4} CE",
+               "sellPut":  f"{sym} {k_dn25} PE", "buyPut":  f"{sym} {k_dn4} PE",
+               "expiry": ex, "premium": f"₹{condor_prem}"}
+    return opt, det
+
+def generate_signals(syms: list, close: np.ndarray, high: np.ndarray, low: np.ndarray,
+                     lengths: np.ndarray, now_iso: str, expiry: str) -> list:
+    """
+    close/high/low: (N, N_BARS) float32 blocks, row i right-aligned with
+    lengths[i] valid bars. Indicators and scores are computed for all rows at
+    once; per-symbol dicts are only built for the JSON payload.
+    """
+    raw = batched_indicators(close, high, low, lengths)
+    bb_width = np.round(np.divide((raw[:, 7] - raw[:, 8]) * 100, raw[:, 6],
+                                  out=np.zeros(len(syms)), where=raw[:, 6] != 0), 2)
+    (rsi, macd_line, macd_sig, macd_hist, ema9, ema21, sma20,
+     bb_upper, bb_lower, atr) = np.round(raw, 2).T
+
+    closes = close.astype(np.float64)
+    price  = closes[:, -1]
+    rng    = bb_upper - bb_lower
+    bbpos  = np.divide(price - bb_lower, rng, out=np.full(len(syms), 0.5), where=rng > 0)
+    score, direction, confidence, reasons = score_signals(price, rsi, macd_hist, ema9, ema21, bbpos, sma20)
+
+    # Price-derived figures for every symbol in one shot (rows have ≥10 bars);
+    # every float in the payload is rounded here, a block at a time
+    change   = np.round((price - closes[:, -2]) / closes[:, -2] * 100, 2)
+    change5d = np.round((price - closes[:, -6]) / closes[:, -6] * 100, 2)
+    strikes  = to_strike(price[:, None] * _STRIKE_MULTS).tolist()
+    levels   = np.round(price[:, None] * _LEVEL_MULTS, 2).tolist()
+    premiums = np.round(atr[:, None] * _ATR_MULTS).astype(np.int64).tolist()
+    price_r, bbpos_r, score_r = np.round(np.stack([price, bbpos, score]), 2)
 
-    return {
-        "sym": sym, "sector": SECTOR_MAP.get(sym, "Misc"),
-        "price": round(price, 2), "change": chg, "change5d": chg5,
-        "rsi": rsi, "macd": macd, "bb": bb, "bbPos": round(bbpos, 2),
-        "sma20": sma20, "ema9": ema9, "ema21": ema21, "atr": atr,
-        "score": round(sc, 2), "direction": direction, "confidence": confidence,
-        "reasons": rs[:3], "optionStrategy": opt, "optionDetails": det,
-        "priceHistory": [round(p, 2) for p in prices[-60:]],
-        "lastUpdated": datetime.now().isoformat(),
-    }
-
-# ─── BATCH FETCHER ────────────────────────────────────────────────────────────
-def do_fetch():
-    global _cache, _cache_ts, _fetching
-    if _fetching:
-        return
-    _fetching = True
-    logger.info("Fetching all Nifty 50 via nsepython...")
     results = []
+    for i, sym in enumerate(syms):
+        s = closes[i, closes.shape[1] - lengths[i]:]
+        opt, det = option_play(sym, str(direction[i]), int(confidence[i]), strikes[i], levels[i], premiums[i], expiry)
+        results.append({
+            "sym": sym, "sector": SECTOR_MAP.get(sym, "Misc"),
+            "price": float(price_r[i]), "change": float(change[i]), "change5d": float(change5d[i]),
+            "rsi": float(rsi[i]),
+            "macd": {"macd": float(macd_line[i]), "signal": float(macd_sig[i]), "hist": float(macd_hist[i])},
+            "bb": {"upper": float(bb_upper[i]), "lower": float(bb_lower[i]),
+                   "mid": float(sma20[i]), "width": float(bb_width[i])},
+            "bbPos": float(bbpos_r[i]),
+            "sma20": float(sma20[i]), "ema9": float(ema9[i]), "ema21": float(ema21[i]), "atr": float(atr[i]),
+            "score": float(score_r[i]), "direction": str(direction[i]), "confidence": int(confidence[i]),
+            "reasons": [r for r, hit in zip(REASONS, reasons[:, i]) if hit][:3],
+            "optionStrategy": opt, "optionDetails": det,
+            "priceHistory": np.round(s, 2).tolist(),
+            "lastUpdated": now_iso,
+        })
+    return results
+
+def generate_signals_memo(syms: list, dates: list, close: np.ndarray, high: np.ndarray,
+                          low: np.ndarray, lengths: np.ndarray, now_iso: str, expiry: str) -> list:
+    """
+    generate_signals, but only for symbols whose bars (or the option expiry)
+    changed since the previous refresh; the rest reuse last refresh's dict.
+    """
+    global _signal_memo
+    keys   = [f"{sym}:{d}" for sym, d in zip(syms, dates)]
+    prints = [(close[i].tobytes(), high[i].tobytes(), low[i].tobytes(), expiry) for i in range(len(syms))]
+    miss   = [i for i, (key, fp) in enumerate(zip(keys, prints)) if _signal_memo.get(key, (None,))[0] != fp]
+
+    fresh = iter(generate_signals([syms[i] for i in miss], close[miss], high[miss], low[miss],
+                                  lengths[miss], now_iso, expiry) if miss else [])
+    miss  = set(miss)
+    results = [next(fresh) if i in miss else {**_signal_memo[key][1], "lastUpdated": now_iso}
+               for i, key in enumerate(keys)]
+
+    _signal_memo = {key: (fp, sig) for key, fp, sig in zip(keys, prints, results)}
+    return results
 
-    for sym in NIFTY50_SYMBOLS:
+# ─── BATCH FETCHER ────────────────────────────────────────────────────────────
+async def fetch_all() -> tuple:
+    """All per-symbol downloads plus the index fetch, FETCH_WORKERS at a time."""
+    loop = asyncio.get_running_loop()
+    results = await asyncio.gather(
+        loop.run_in_executor(_fetch_pool, fetch_nifty),
+        *(loop.run_in_executor(_fetch_pool, fetch_stock, sym) for sym in NIFTY50_SYMBOLS),
+        return_exceptions=True,
+    )
+    return results[0], results[1:]
+
+def build_cache(frames: list, nifty: dict):
+    global _cache, _cache_bytes, _cache_gz, _cache_etag, _cache_ts
+    now_iso = datetime.now().isoformat()  # one timestamp and expiry for the whole refresh
+    expiry  = next_expiry()
+    syms, dates = [], []
+    shape = (len(NIFTY50_SYMBOLS), N_BARS)
+    close = np.full(shape, np.nan, dtype=np.float32)
+    high  = np.full(shape, np.nan, dtype=np.float32)
+    low   = np.full(shape, np.nan, dtype=np.float32)
+    lengths = np.zeros(len(NIFTY50_SYMBOLS), dtype=np.int64)
+
+    # Bars land right-aligned in one (symbols, N_BARS) float32 block per field
+    for sym, df in zip(NIFTY50_SYMBOLS, frames):
         try:
-            df  = fetch_stock(sym)
+            if isinstance(df, Exception):
+                raise df
             if df.empty or len(df) < 10:
                 logger.warning(f"✗ {sym}: insufficient data ({len(df)} rows)")
                 continue
-            sig = generate_signal(sym, df)
-            if sig:
-                results.append(sig)
-                logger.info(f"✓ {sym}: ₹{sig['price']} [{sig['direction']}]")
-            time.sleep(0.5)  # polite delay
+            i, n = len(syms), len(df)
+            chl  = df[["close", "high", "low"]].to_numpy(dtype=np.float32)
+            close[i, N_BARS - n:] = chl[:, 0]
+            high[i, N_BARS - n:]  = chl[:, 1]
+            low[i, N_BARS - n:]   = chl[:, 2]
+            lengths[i] = n
+            syms.append(sym)
+            dates.append(str(df["date"].iloc[-1].date()))
         except Exception as e:
             logger.error(f"✗ {sym}: {e}")
             continue
 
+    k = len(syms)
+    results = generate_signals_memo(syms, dates, close[:k], high[:k], low[:k], lengths[:k], now_iso, expiry) if syms else []
+    for sig in results:
+        logger.info(f"✓ {sig['sym']}: ₹{sig['price']} [{sig['direction']}]")
+
     logger.info(f"Fetch complete: {len(results)}/{len(NIFTY50_SYMBOLS)} stocks")
 
     if results:
         longs    = sum(1 for s in results if s["direction"] == "LONG")
         shorts   = sum(1 for s in results if s["direction"] == "SHORT")
         neutrals = sum(1 for s in results if s["direction"] == "NEUTRAL")
-        _cache = {
+        cache = {
             "stocks": results,
-            "nifty": fetch_nifty(),
+            "nifty": nifty,
             "summary": {"longs": longs, "shorts": shorts, "neutrals": neutrals, "total": len(results)},
-            "fetchedAt": datetime.now().isoformat(),
+            "fetchedAt": now_iso,
             "nextRefresh": CACHE_TTL,
-            "dataSource": "NSE India (via nsepython)",
+            "dataSource": PROVIDER.name,
         }
-        _cache_ts = time.time()
+        payload = orjson.dumps(cache, option=orjson.OPT_SERIALIZE_NUMPY)
+        gz      = gzip.compress(payload, compresslevel=6)
+        etag    = hashlib.md5(payload).hexdigest()
+        with _cache_lock:
+            _cache, _cache_bytes, _cache_gz, _cache_etag, _cache_ts = cache, payload, gz, etag, time.time()
         logger.info("✓ Cache updated")
     else:
         logger.error("No results — all fetches failed")
 
-    _fetching = False
+async def do_fetch():
+    logger.info(f"Fetching all Nifty 50 via {PROVIDER.name}...")
+    nifty, frames = await fetch_all()
+    if isinstance(nifty, Exception):
+        logger.error(f"Nifty index error: {nifty}")
+        nifty = {"price": 22450.0, "change": 0.0, "changePct": 0.0}
+    # Indicators, scoring and encoding are CPU work — keep them off the event loop
+    await asyncio.to_thread(build_cache, frames, nifty)
+
+async def refresher():
+    """The only caller of do_fetch: refresh every CACHE_TTL seconds, or sooner on request."""
+    while True:
+        _refresh_now.clear()
+        async with _fetch_lock:
+            try:
+                await do_fetch()
+            except Exception as e:
+                logger.error(f"Refresh failed: {e}")
+        try:
+            await asyncio.wait_for(_refresh_now.wait(), CACHE_TTL)
+        except asyncio.TimeoutError:
+            pass
 
 # ─── LIFESPAN ─────────────────────────────────────────────────────────────────
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    threading.Thread(target=do_fetch, daemon=True).start()
-    logger.info("Startup: background fetch triggered")
+    global _fetch_pool, _fetch_lock, _refresh_now
+    _fetch_pool  = ThreadPoolExecutor(max_workers=FETCH_WORKERS, thread_name_prefix="fetch")
+    _fetch_lock  = asyncio.Lock()
+    _refresh_now = asyncio.Event()
+    task = asyncio.create_task(refresher())
+    logger.info("Startup: background refresher started")
     yield
+    # Queued downloads are dropped; ones already inside a provider call finish
+    # first (bounded by the provider's own HTTP timeouts)
+    _fetch_pool.shutdown(wait=False, cancel_futures=True)
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
 
 app = FastAPI(title="N50 Swing Algo API", version="5.0.0", lifespan=lifespan)
 
@@ -314,7 +415,7 @@ app.add_middleware(
 # ─── ROUTES ───────────────────────────────────────────────────────────────────
 @app.get("/")
 def root():
-    return {"status": "ok", "message": "N50 Swing Algo API v5 — nsepython"}
+    return {"status": "ok", "message": f"N50 Swing Algo API v5 — {PROVIDER.name}"}
 
 @app.get("/api/health")
 def health():
@@ -322,12 +423,12 @@ def health():
         "status": "healthy",
         "cacheAge": round(time.time() - _cache_ts) if _cache_ts else None,
         "stocksCached": len(_cache.get("stocks", [])) if _cache else 0,
-        "fetching": _fetching,
+        "fetching": _fetch_lock.locked(),
     }
 
 @app.get("/api/test")
 def test():
-    """Test NSE connectivity with INFY."""
+    """Test data provider connectivity with INFY."""
     try:
         df = fetch_stock("INFY")
         return {
@@ -341,45 +442,46 @@ def test():
     except Exception as e:
         # Also return raw columns if possible for debugging
         try:
-            from nsepython import equity_history
-            end   = datetime.now().strftime("%d-%m-%Y")
-            start = (datetime.now() - timedelta(days=10)).strftime("%d-%m-%Y")
-            raw = equity_history("INFY", "EQ", start, end)
+            now = datetime.now()
+            with _fetch_slots:
+                raw = PROVIDER.fetch_raw("INFY", now - timedelta(days=10), now)
             return {"status": "error", "message": str(e), "rawColumns": list(raw.columns) if hasattr(raw, 'columns') else str(type(raw))}
         except Exception as e2:
             return {"status": "error", "message": str(e), "rawError": str(e2)}
 
 @app.get("/api/refresh")
-def refresh():
+async def refresh():
     """Manually trigger a re-fetch."""
-    global _fetching
-    if _fetching:
+    if _fetch_lock.locked() or _refresh_now.is_set():
         return {"status": "already fetching"}
-    threading.Thread(target=do_fetch, daemon=True).start()
+    _refresh_now.set()
     return {"status": "fetch started"}
 
 @app.get("/api/stocks")
-def get_stocks():
-    # Fresh cache — return immediately
-    if _cache and (time.time() - _cache_ts) < CACHE_TTL:
-        return JSONResponse(content=_cache)
-
-    # Stale cache — return it and refresh in background
-    if _cache:
-        if not _fetching:
-            threading.Thread(target=do_fetch, daemon=True).start()
-        return JSONResponse(content=_cache)
-
-    # Still loading first time
-    if _fetching:
-        return JSONResponse(status_code=503, content={
-            "error": "Data is loading for the first time, please retry in 60 seconds",
-            "fetching": True,
-        })
-
-    # Nothing yet — trigger and return 503
-    threading.Thread(target=do_fetch, daemon=True).start()
+async def get_stocks(request: Request):
+    with _cache_lock:
+        body, gz, etag = _cache_bytes, _cache_gz, _cache_etag
+
+    # Cached payload (the refresher keeps it current) — return immediately,
+    # pre-compressed when the client accepts gzip. Clients must revalidate on
+    # every request (a manual refresh can land at any time), which costs a 304
+    # until the payload changes; each encoding gets its own validator
+    if body:
+        use_gz  = "gzip" in request.headers.get("accept-encoding", "")
+        tag     = f'"{etag}-gz"' if use_gz else f'"{etag}"'
+        headers = {"Vary": "Accept-Encoding", "ETag": tag, "Cache-Control": "no-cache"}
+        if tag in request.headers.get("if-none-match", ""):
+            return Response(status_code=304, headers=headers)
+        if use_gz:
+            return Response(content=gz, media_type="application/json",
+                            headers={**headers, "Content-Encoding": "gzip"})
+        return Response(content=body, media_type="application/json", headers=headers)
+
+    # Still loading first time — or the first refresh failed, in which case
+    # wake the refresher now rather than serving 503 until CACHE_TTL runs out
+    if not _fetch_lock.locked():
+        _refresh_now.set()
     return JSONResponse(status_code=503, content={
-        "error": "Fetching data now, please retry in 60 seconds",
+        "error": "Data is loading for the first time, please retry in 60 seconds",
         "fetching": True,
     })
@@ -0,0 +1,114 @@
+"""
+Market data providers. Each one downloads daily bars for a symbol and the
+NIFTY 50 index quote; main.py picks one with the DATA_PROVIDER env var.
+"""
+
+from datetime import datetime, timedelta
+from typing import Protocol
+
+import pandas as pd
+
+
+class DataProvider(Protocol):
+    key: str   # DATA_PROVIDER value, also the bar cache namespace
+    name: str  # shown as the payload's dataSource
+
+    def fetch_raw(self, symbol: str, start: datetime, end: datetime) -> pd.DataFrame:
+        """Daily bars for [start, end], in the provider's own shape."""
+
+    def normalise(self, df: pd.DataFrame) -> pd.DataFrame:
+        """fetch_raw's frame → date/open/high/low/close, incomplete rows dropped."""
+
+    def fetch_index(self) -> dict | None:
+        """NIFTY 50 price/change/changePct, or None if the response lacks it."""
+
+
+def _coerce(df: pd.DataFrame) -> pd.DataFrame:
+    for col in ["open", "high", "low", "close"]:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors="coerce")
+    # Incomplete bars would poison ATR/bands in the fastmath kernel; keep only full ones
+    return df.dropna(subset=["date", "high", "low", "close"])
+
+
+# ─── NSE (nsepython) ──────────────────────────────────────────────────────────
+class NsePythonProvider:
+    """Official NSE data through nsepython (works from cloud servers)."""
+    key  = "nse"
+    name = "NSE India (via nsepython)"
+
+    # NSE column names (lower-cased) → standard names
+    COLS = {
+        "ch_timestamp":        "date",
+        "ch_opening_price":    "open",
+        "ch_trade_high_price": "high",
+        "ch_trade_low_price":  "low",
+        "ch_closing_price":    "close",
+    }
+
+    def fetch_raw(self, symbol, start, end):
+        from nsepython import equity_history
+        # equity_history returns a DataFrame directly
+        return equity_history(symbol, "EQ", start.strftime("%d-%m-%Y"), end.strftime("%d-%m-%Y"))
+
+    def normalise(self, df):
+        # Pick just the OHLC columns off the raw NSE frame (~20 wide) in one
+        # selection instead of renaming and then slicing the whole thing
+        pick = {c: self.COLS[k] for c in df.columns if (k := c.strip().lower()) in self.COLS}
+        df = df.loc[:, list(pick)].rename(columns=pick)
+        df["date"] = pd.to_datetime(df["date"], errors="coerce")
+        return _coerce(df)
+
+    def fetch_index(self):
+        from nsepython import nsefetch
+        data = nsefetch("https://www.nseindia.com/api/allIndices")
+        for idx in data.get("data", []):
+            if idx.get("index") == "NIFTY 50":
+                return {
+                    "price":     round(float(idx["last"]), 2),
+                    "change":    round(float(idx["change"]), 2),
+                    "changePct": round(float(idx["percentChange"]), 2),
+                }
+        return None
+
+
+# ─── YAHOO (yfinance) ─────────────────────────────────────────────────────────
+class YahooProvider:
+    """Yahoo Finance `.NS` tickers (~15 min delayed); needs `pip install yfinance`."""
+    key  = "yahoo"
+    name = "Yahoo Finance (via yfinance)"
+
+    def fetch_raw(self, symbol, start, end):
+        import yfinance as yf
+        # Yahoo's end date is exclusive
+        return yf.Ticker(f"{symbol}.NS").history(
+            start=start.strftime("%Y-%m-%d"), end=(end + timedelta(days=1)).strftime("%Y-%m-%d"),
+            interval="1d", auto_adjust=False)
+
+    def normalise(self, df):
+        df = df.reset_index()
+        df.columns = [str(c).strip().lower() for c in df.columns]
+        df = df.loc[:, ["date", "open", "high", "low", "close"]]
+        # Exchange-local timestamps → naive midnight, like NSE's CH_TIMESTAMP
+        df["date"] = pd.to_datetime(df["date"], errors="coerce").dt.tz_localize(None).dt.normalize()
+        return _coerce(df)
+
+    def fetch_index(self):
+        import yfinance as yf
+        closes = yf.Ticker("^NSEI").history(period="5d", interval="1d")["Close"].dropna()
+        if len(closes) < 2:
+            return None
+        last, prev = float(closes.iloc[-1]), float(closes.iloc[-2])
+        return {
+            "price":     round(last, 2),
+            "change":    round(last - prev, 2),
+            "changePct": round((last - prev) / prev * 100, 2),
+        }
+
+
+PROVIDERS = {p.key: p for p in (NsePythonProvider(), YahooProvider())}
+
+def get_provider(key: str) -> DataProvider:
+    if key not in PROVIDERS:
+        raise ValueError(f"Unknown DATA_PROVIDER {key!r}, expected one of: {', '.join(PROVIDERS)}")
+    return PROVIDERS[key]